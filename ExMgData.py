@@ -1,38 +1,47 @@
 #*-* encoding:utf-8*-*
+import mmap
 import os
 import sys
 import json
-from struct import unpack
-from typing import BinaryIO, Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from struct import unpack_from
+from typing import Dict, List, Tuple
 
-KEY = '女教師ゆうこ1968'.encode('cp932') # Use Garbro for keys
+import numpy as np
 
-def unpack_uint32(file: BinaryIO, offset: int) -> int:
-    file.seek(offset)
-    return unpack('<I', file.read(4))[0]
+KEY = '女教師ゆうこ1968'.encode('cp932') # Use Garbro for keys
+READ_BUFFER_SIZE = 128 * 1024
 
 def xor_decrypt(data: bytes, key: bytes) -> bytes:
-    return bytes(data[i] ^ key[i % len(key)] for i in range(len(data)))
+    data_arr = np.frombuffer(data, np.uint8)
+    key_arr = np.resize(np.frombuffer(key, np.uint8), data_arr.size)
+    return (data_arr ^ key_arr).tobytes()
+
+def read_entry(index_blob: bytes, base_offset: int, name_offset: int, file_offset: int, size_offset: int) -> Tuple[str, int, int]:
+    if base_offset + max(file_offset, size_offset) + 4 > len(index_blob):
+        return None, 0, 0
 
-def read_entry(file: BinaryIO, base_offset: int, name_offset: int, file_offset: int, size_offset: int) -> Tuple[str, int, int]:
-    file.seek(base_offset + name_offset)
-    name_bytes = file.read(0x20)  # Read up to 32 bytes for the name
+    name_bytes = index_blob[base_offset + name_offset:base_offset + name_offset + 0x20]  # Up to 32 bytes for the name
     try:
         name = name_bytes.split(b'\x00', 1)[0].decode('cp932')
     except UnicodeDecodeError:
         return None, 0, 0
 
-    offset = unpack_uint32(file, base_offset + file_offset)
-    size = unpack_uint32(file, base_offset + size_offset)
+    offset = unpack_from('<I', index_blob, base_offset + file_offset)[0]
+    size = unpack_from('<I', index_blob, base_offset + size_offset)[0]
     return name, offset, size
 
-def save_file(file: BinaryIO, output_dir: str, name: str, offset: int, size: int, key: bytes) -> None:
+def save_file(mm: mmap.mmap, output_dir: str, name: str, offset: int, size: int, key: bytes) -> None:
     output_path = os.path.join(output_dir, name)
-    file.seek(offset)
-    data = xor_decrypt(file.read(size), key)
+    key_index = 0
     with open(output_path, 'wb') as out_file:
-        out_file.write(data)
-    print(f"Data saved to: {output_path}")
+        # Slice the mapping instead of seeking so concurrent workers can share it
+        for pos in range(0, size, READ_BUFFER_SIZE):
+            chunk = mm[offset + pos:offset + min(pos + READ_BUFFER_SIZE, size)]
+            # Rotate the key so tiling stays aligned across chunk boundaries
+            rotated = key[key_index:] + key[:key_index]
+            out_file.write(xor_decrypt(chunk, rotated))
+            key_index = (key_index + len(chunk)) % len(key)
 
 def process_mbl(input_file: str, output_dir: str) -> None:
     data_entries: Dict[str, str] = {}
@@ -41,19 +50,19 @@ def process_mbl(input_file: str, output_dir: str) -> None:
         {"entry_size": 0x18, "name_offset": 0x00, "file_offset": 0x10, "size_offset": 0x14, "key": KEY}
     ]
 
-    with open(input_file, 'rb') as f:
-        count = unpack_uint32(f, 0)
+    with open(input_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        count = unpack_from('<I', mm, 0)[0]
         entries: List[Tuple[str, int, int]] = []
         successful_params = None
-        
+
         for params in parameter_sets:
-            f.seek(4)  # Reset to start of entries
+            index_blob = mm[4:4 + count * params["entry_size"]]  # Whole index in one slice
             entries.clear()
             success = True
 
             for i in range(count):
-                base_offset = 0x04 + i * params["entry_size"]
-                entry = read_entry(f, base_offset, params["name_offset"], params["file_offset"], params["size_offset"])
+                base_offset = i * params["entry_size"]
+                entry = read_entry(index_blob, base_offset, params["name_offset"], params["file_offset"], params["size_offset"])
                 if entry[0] is None:
                     success = False
                     print(f"Decoding failed with entry size {params['entry_size']}. Trying next parameter set.")
@@ -69,17 +78,25 @@ def process_mbl(input_file: str, output_dir: str) -> None:
             print("Failed to decode with all parameter sets. Exiting.")
             return
 
+        key = successful_params["key"]
+        entry_size = successful_params["entry_size"]
+
+        # Entries are independent; XOR and file writes overlap across threads
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            futures = [executor.submit(save_file, mm, output_dir, name, offset, size, key)
+                       for name, offset, size in entries]
+            for i, future in enumerate(futures):
+                future.result()
+                # Per-entry prints dominate wall time on large archives
+                if i % 256 == 0:
+                    print(f"Extracting {i+1}/{count}: {entries[i][0]}")
+
         for i, (name, offset, size) in enumerate(entries):
-            print(f"Entry {i+1}/{count}:")
-            print(f"Name: {name}")
-            print(f"Data Offset: {offset}")
-            print(f"Size: {size}")
-            
-            save_file(f, output_dir, name, offset, size, successful_params["key"])
-            f.seek(0x04 + i * successful_params["entry_size"])
-            additional_bytes = f.read(successful_params["entry_size"])
+            additional_bytes = index_blob[i * entry_size:(i + 1) * entry_size]
             data_entries[name] = ''.join(f"{byte:02x}" for byte in additional_bytes)
-    
+
+    print(f"Extracted {count} entries to {output_dir}")
+
     output_data = {
         "parameters": {
             "entry_size": successful_params["entry_size"],
@@ -1,8 +1,17 @@
+import mmap
 import struct
 import sys
 import os
-import zlib
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+# Prefer a SIMD-accelerated deflate if one is installed; both are drop-ins
+try:
+    from isal import isal_zlib as zlib
+except ImportError:
+    try:
+        from zlib_ng import zlib_ng as zlib
+    except ImportError:
+        import zlib
 
 class Entry:
     def __init__(self, name, entry_type, offset, size):
@@ -15,59 +24,82 @@ class Entry:
         return self.offset + self.size <= max_offset
 
 class ArcFile:
-    def __init__(self, file_data, entries):
-        self.file_data = file_data
+    def __init__(self, mm, file, entries):
+        self.mm = mm
+        self.file = file
         self.entries = entries
 
     def open_entry(self, entry):
-        self.file_data.seek(entry.offset)
-        return self.file_data.read(entry.size)
+        # Zero-copy random access; only the touched pages are faulted in
+        return self.mm[entry.offset:entry.offset + entry.size]
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
 
-def read_string(file, length):
-    raw_string = file.read(length)
+def parse_string(raw_string):
     return raw_string.split(b'\x00', 1)[0].decode('utf-8').lower()
 
 def is_sane_count(count):
     return 0 < count < 10000  # Adjust this sanity check based on expected file size
 
 def try_open_gra_mbl(file_path):
-    with open(file_path, 'rb') as f:
-        file_data = BytesIO(f.read())
+    f = open(file_path, 'rb')
+    mm = None
+    arc_file = None
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Read filename length and entry count
+        count, filename_len = struct.unpack_from('<I I', mm, 0)
 
-    # Read filename length and entry count
-    file_data.seek(0)
-    count,filename_len = struct.unpack('<I I', file_data.read(8))
+        if filename_len < 8 or filename_len > 0x40 or not is_sane_count(count):
+            return None
 
-    if filename_len < 8 or filename_len > 0x40 or not is_sane_count(count):
-        return None
+        # Verify the file name to match the archive type
+        arc_name = os.path.splitext(os.path.basename(file_path))[0]
+        if arc_name.lower() != "mg_gra":
+            return None
 
-    # Verify the file name to match the archive type
-    arc_name = os.path.splitext(os.path.basename(file_path))[0]
-    if arc_name.lower() != "mg_gra":
-        return None
+        file_size = len(mm)
+        entry_size = filename_len + 8
+        entries = []
 
-    index_offset = 8
-    entries = []
+        # Read index entries straight from the mapping
+        for i in range(count):
+            base = 8 + i * entry_size
+            name = parse_string(mm[base:base + filename_len])
+            offset, size = struct.unpack_from('<I I', mm, base + filename_len)
+            entry = Entry(name + ".prs", "image", offset, size)
 
-    # Read index entries
-    for _ in range(count):
-        file_data.seek(index_offset)
-        name = read_string(file_data, filename_len)
-        index_offset += filename_len
+            if not entry.check_placement(file_size):
+                return None
 
-        offset, size = struct.unpack('<I I', file_data.read(8))
-        entry = Entry(name + ".prs", "image", offset, size)
+            entries.append(entry)
 
-        if not entry.check_placement(len(file_data.getvalue())):
+        if not entries or (len(entries) == 1 and count > 1):
             return None
 
-        entries.append(entry)
-        index_offset += 8
+        arc_file = ArcFile(mm, f, entries)
+        return arc_file
+    finally:
+        # Close the handles on every rejection or parse error; once an
+        # ArcFile owns them its close() takes over
+        if arc_file is None:
+            if mm is not None:
+                mm.close()
+            f.close()
+
+def extract_entry(arc_file, entry, output_dir):
+    data = arc_file.open_entry(entry)
 
-    if not entries or (len(entries) == 1 and count > 1):
-        return None
+    # If the first byte is 0x78, it's compressed with zlib
+    if data[0] == 0x78:
+        data = zlib.decompress(data)
 
-    return ArcFile(file_data, entries)
+    output_file = os.path.join(output_dir, entry.name)
+    with open(output_file, 'wb') as f:
+        f.write(data)
 
 def extract_mbl(file_path, output_dir):
     arc_file = try_open_gra_mbl(file_path)
@@ -75,17 +107,21 @@ def extract_mbl(file_path, output_dir):
         print(f"Failed to open archive: {file_path}")
         return
 
-    for entry in arc_file.entries:
-        data = arc_file.open_entry(entry)
-        
-        # If the first byte is 0x78, it's compressed with zlib
-        if data[0] == 0x78:
-            data = zlib.decompress(data)
-
-        output_file = os.path.join(output_dir, entry.name)
-        with open(output_file, 'wb') as f:
-            f.write(data)
-        print(f"Extracted: {output_file}")
+    count = len(arc_file.entries)
+
+    try:
+        # Entries are independent; zlib and file writes overlap across threads
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            futures = [executor.submit(extract_entry, arc_file, entry, output_dir)
+                       for entry in arc_file.entries]
+            for i, future in enumerate(futures):
+                future.result()
+                # Per-entry prints dominate wall time on large archives
+                if i % 256 == 0:
+                    print(f"Extracting {i+1}/{count}: {arc_file.entries[i].name}")
+    finally:
+        arc_file.close()
+    print(f"Extracted {count} entries to {output_dir}")
 
 
 if __name__ == "__main__":
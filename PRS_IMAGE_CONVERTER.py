@@ -1,9 +1,24 @@
 import argparse
+import array
 import os
 import struct
-import io
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 from PIL import Image
 
+try:
+    from numba import int64, njit
+    from numba.core.errors import NumbaError
+except ImportError:  # Numba is optional; the pure-Python decoder still works
+    njit = None
+
+# Prebuilt Cython decoder (see prs_decoder.pyx); no JIT warmup, so it is
+# preferred over Numba for one-shot conversions when it has been built
+try:
+    from prs_decoder import unpack_c as _prs_unpack_c
+except ImportError:
+    _prs_unpack_c = None
+
 class PrsMetaData:
     def __init__(self, width, height, bpp, flag, packed_size=0):
         self.width = width
@@ -13,124 +28,143 @@ class PrsMetaData:
         self.packed_size = packed_size
 
 class PrsWriter:
+    HASH_SIZE = 1 << 15  # 15-bit hash of 3-byte strings
+    MAX_CHAIN = 128      # bound on candidates examined per match attempt
+    WINDOW_SIZE = 0x2000
+
     def __init__(self, image, flag):
         self.metadata = PrsMetaData(image.width, image.height, image.mode == 'RGBA' and 32 or 24, flag)
         self.depth = self.metadata.bpp // 8
         self.stride = self.metadata.width * self.depth
-        self.input = bytearray(self.stride * self.metadata.height)
-        self.output = io.BytesIO()
-        self.hash_table = {}
-
-        # Convert image to byte array
-        pixels = image.load()
-        for y in range(image.height):
-            for x in range(image.width):
-                idx = (y * self.stride) + (x * self.depth)
-                pixel = pixels[x, y]
-                self.input[idx:idx+3] = pixel[:3][::-1]  # BGR order
-                if self.depth == 4:
-                    self.input[idx+3] = pixel[3]
+        self.body = bytearray()
+
+        # Convert image to a BGR(A)-ordered byte array with one vectorized shuffle
+        arr = np.asarray(image, dtype=np.uint8).reshape(self.metadata.height, self.metadata.width, self.depth).copy()
+        arr[..., :3] = arr[..., 2::-1]
 
         if (self.metadata.flag & 0x80) != 0:
-            for i in range(len(self.input) - 1, self.depth - 1, -1):
-                self.input[i] = (self.input[i] - self.input[i - self.depth] + 256) % 256
+            # Per-component delta filter; uint8 arithmetic wraps mod 256
+            flat = arr.reshape(-1, self.depth)
+            flat[1:] = flat[1:] - flat[:-1]
+
+        self.input = bytearray(arr.tobytes())
+        # LZ77 head/prev hash chains bounded to the back-reference window
+        self.head = array.array('i', [-1]) * self.HASH_SIZE
+        self.prev = array.array('i', [-1]) * len(self.input)
+
+        # Precompute the hash slot of every 3-byte string in one vectorized pass
+        flat = np.frombuffer(self.input, np.uint8).astype(np.uint32)
+        self.hashes = array.array('I')
+        if flat.size >= 3:
+            slots = ((flat[:-2] * np.uint32(2654435761)) ^ (flat[1:-1] << np.uint32(8)) ^ flat[2:]) & np.uint32(self.HASH_SIZE - 1)
+            self.hashes.frombytes(slots.tobytes())
 
     def hash(self, index):
         if index + 3 > len(self.input):
             return 0
-        return self.input[index] | (self.input[index + 1] << 8) | (self.input[index + 2] << 16)
+        return self.hashes[index]
 
-    def pack(self):
-        # Write header
-        self.output.write(b'YB')
-        self.output.write(bytes([self.metadata.flag, self.metadata.bpp // 8]))
-        self.output.write(b'\x00' * 8)  # Placeholder for packed size
-        self.output.write(struct.pack('<HH', self.metadata.width, self.metadata.height))
+    def insert_hash(self, index):
+        h = self.hash(index)
+        self.prev[index] = self.head[h]
+        self.head[h] = index
 
+    def pack(self):
         input_index = 0
         control = 0
-        mask = 1
+        mask = 0x80  # decoder consumes control bits MSB-first
         control_buffer = bytearray()
 
-        while input_index < len(self.input):
-            match_length, match_offset = self.find_longest_match(input_index)
+        # Bind hot attributes and methods to locals outside the loop
+        inp = self.input
+        input_len = len(inp)
+        body = self.body
+        cb_append = control_buffer.append
+        find_longest_match = self.find_longest_match
+        insert_hash = self.insert_hash
+
+        while input_index < input_len:
+            emit_start = input_index
+            match_length, match_offset = find_longest_match(input_index)
 
             if match_length < 3:
                 # Literal byte
-                control_buffer.append(self.input[input_index])
+                cb_append(inp[input_index])
                 input_index += 1
             else:
                 # Set control bit
                 control |= mask
 
-                if match_length <= 5 and match_offset <= 256:
-                    # Short match
-                    encoded_value = ((match_offset - 1) | ((match_length - 2) << 6)) & 0xFF
-                    control_buffer.append(encoded_value)
+                if match_length <= 4 and match_offset <= 32:
+                    # Short match: 5-bit offset, 2-bit length
+                    cb_append(((match_offset - 1) << 2) | (match_length - 2))
+                elif match_length <= 18 and match_offset <= 1024:
+                    # Mid match: 10-bit offset, 4-bit length
+                    encoded = ((match_offset - 1) << 4) | (match_length - 3)
+                    cb_append(0x80 | (encoded >> 8))
+                    cb_append(encoded & 0xFF)
                 else:
-                    # Long match
+                    # Long match: 14-bit offset, length via the decoder's table
                     encoded_offset = match_offset - 1
-                    if match_length <= 9:
-                        encoded_length = match_length - 2
-                        control_buffer.append(0x80 | (encoded_offset >> 5))
-                        control_buffer.append((encoded_offset & 0x1F) | (encoded_length << 5))
-                    else:
-                        control_buffer.append(0xC0 | (encoded_offset >> 8))
-                        control_buffer.append(encoded_offset & 0xFF)
-                        control_buffer.append(match_length - 1)
+                    cb_append(0xC0 | (encoded_offset >> 8))
+                    cb_append(encoded_offset & 0xFF)
+                    cb_append(match_length - 3)
 
                 input_index += match_length
 
-            mask <<= 1
-            if mask == 0x100:
-                self.output.write(bytes([control]))
-                self.output.write(control_buffer)
-                control_buffer = bytearray()
+            mask >>= 1
+            if mask == 0:
+                body.append(control)
+                body.extend(control_buffer)
+                control_buffer.clear()
                 control = 0
-                mask = 1
+                mask = 0x80
 
-            # Update hash table
-            for i in range(input_index - match_length, input_index):
-                h = self.hash(i)
-                if h not in self.hash_table:
-                    self.hash_table[h] = []
-                self.hash_table[h].append(i)
+            # One head update per emit, zlib-style; chaining every interior
+            # match position costs O(match_len) for little extra ratio
+            insert_hash(emit_start)
 
         # Write final control byte and buffer if necessary
-        if mask != 1 or control_buffer:
-            self.output.write(bytes([control]))
-            self.output.write(control_buffer)
+        if mask != 0x80 or control_buffer:
+            self.body.append(control)
+            self.body.extend(control_buffer)
 
-        # Update packed size in header
-        self.metadata.packed_size = self.output.tell() - 16
-        self.output.seek(4)
-        self.output.write(struct.pack('<I', self.metadata.packed_size))
+        # Header is built last, once the packed size is known
+        self.metadata.packed_size = len(self.body)
+        self.header = _PRS_HEADER.pack(b'YB', self.metadata.flag, self.metadata.bpp // 8,
+                                       self.metadata.packed_size,
+                                       self.metadata.width, self.metadata.height)
 
     def find_longest_match(self, input_index):
         match_length = 0
         match_offset = 0
 
-        h = self.hash(input_index)
-        if h not in self.hash_table:
-            return match_length, match_offset
+        inp = self.input
+        prev = self.prev
+        max_offset = min(input_index, self.WINDOW_SIZE)
+        max_length = min(len(inp) - input_index, 0x100)
 
-        max_offset = min(input_index, 0x2000)
-        max_length = min(len(self.input) - input_index, 0x100)
+        candidate = self.head[self.hash(input_index)]
+        chain = self.MAX_CHAIN
 
-        for offset in self.hash_table[h]:
-            if input_index - offset > max_offset:
-                continue
+        # Walk the chain newest-first; entries beyond the window are older still
+        while candidate >= 0 and chain > 0:
+            if input_index - candidate > max_offset:
+                break
 
             length = 0
-            while length < max_length and self.input[input_index + length] == self.input[offset + length]:
+            while length < max_length and inp[input_index + length] == inp[candidate + length]:
                 length += 1
 
             if length > match_length:
                 match_length = length
-                match_offset = input_index - offset
+                match_offset = input_index - candidate
                 if match_length == max_length:
                     break
 
+            candidate = prev[candidate]
+            chain -= 1
+
         if match_length < 3:
             match_length = 0
             match_offset = 0
@@ -139,13 +173,125 @@ class PrsWriter:
 
     def save_to_file(self, file_path):
         with open(file_path, 'wb') as f:
-            f.write(self.output.getvalue())
+            f.write(self.header + self.body)
+
+# Whole 16-byte PRS header: magic, flag, bytes-per-pixel, packed size,
+# 4 reserved bytes, width, height
+_PRS_HEADER = struct.Struct('<2sBBI4xHH')
+
+# Match lengths for the long-match form; indexed faster than a list of boxed ints
+_LENGTH_TABLE = array.array('H', [i + 3 for i in range(0xfe)] + [0x400, 0x1000])
+_LENGTH_TABLE_NATIVE = np.asarray(_LENGTH_TABLE, np.int64)
+
+def _prs_unpack(src, out, length_table):
+    """LZ77 decode `src` into `out`. Works on bytes/bytearray and, when
+    Numba is available, is compiled over numpy uint8 arrays."""
+    src_len = len(src)
+    out_len = len(out)
+    sp = 0
+    dst = 0
+
+    # One control byte governs the next eight items; refilling in the outer
+    # loop keeps the hard-to-predict refill branch out of the item loop
+    while sp < src_len and dst < out_len:
+        ctl = int(src[sp])
+        sp += 1
+        bit = 0x80
+
+        while bit != 0 and sp < src_len and dst < out_len:
+            flag = ctl & bit
+
+            if flag == 0:
+                if ctl & (bit - 1) == 0:
+                    # Rest of the control byte is all literals; copy as one run
+                    run = 0
+                    m = bit
+                    while m != 0:
+                        run += 1
+                        m >>= 1
+                    count = min(run, src_len - sp, out_len - dst)
+                    out[dst:dst + count] = src[sp:sp + count]
+                    dst += count
+                    sp += count
+                    bit >>= count
+                else:
+                    out[dst] = src[sp]
+                    dst += 1
+                    sp += 1
+                    bit >>= 1
+                continue
 
-class PrsReader:
-    length_table = [i + 3 for i in range(0xfe)] + [0x400, 0x1000]
+            bit >>= 1
+            # int() keeps Numba's type inference on int64; a bare uint8 read
+            # widens `(b & 0x3f) << 8` to uint64 and poisons the cursors
+            b = int(src[sp])
+            sp += 1
+            length = 0
+            shift = 0
+
+            if b & 0x80:
+                if sp >= src_len:
+                    break
+                shift = int(src[sp])
+                sp += 1
+                shift |= (b & 0x3f) << 8
+
+                if b & 0x40:
+                    if sp >= src_len:
+                        break
+                    offset = int(src[sp])
+                    sp += 1
+                    length = int(length_table[offset])
+                else:
+                    length = (shift & 0xf) + 3
+                    shift >>= 4
+            else:
+                length = b >> 2
+                b &= 3
+                if b == 3:
+                    length += 9
+                    count = min(length, src_len - sp, out_len - dst)
+                    out[dst:dst + count] = src[sp:sp + count]
+                    dst += count
+                    sp += count
+                    continue
+                shift = length
+                length = b + 2
+
+            shift += 1
+            if dst < shift:
+                raise ValueError("Invalid offset value")
+            length = min(length, out_len - dst)
+            if shift >= length:
+                # Non-overlapping back-reference: single memmove-backed copy
+                out[dst:dst + length] = out[dst - shift:dst - shift + length]
+                dst += length
+            else:
+                # Overlapping run: replicate the prefix, doubling the chunk
+                chunk = shift
+                while length > chunk:
+                    out[dst:dst + chunk] = out[dst - chunk:dst]
+                    dst += chunk
+                    length -= chunk
+                    chunk <<= 1
+                out[dst:dst + length] = out[dst - chunk:dst - chunk + length]
+                dst += length
 
-    def __init__(self, file_path, meta_data):
-        self.file_path = file_path
+if njit is not None:
+    # Pinning the integer locals to int64 keeps Numba's type inference
+    # stable: left alone, the uint8 loads widened by `<< 8` drift the loop
+    # phis to uint64 and then float64, which cannot index an array
+    _prs_unpack_native = njit(cache=True, locals={
+        'sp': int64, 'dst': int64, 'ctl': int64, 'bit': int64, 'b': int64,
+        'shift': int64, 'length': int64, 'count': int64, 'run': int64,
+        'm': int64, 'chunk': int64,
+    })(_prs_unpack)
+else:
+    _prs_unpack_native = None
+
+class PrsReader:
+    def __init__(self, data, meta_data):
+        self.data = data
         self.width = meta_data.width
         self.height = meta_data.height
         self.depth = meta_data.bpp // 8
@@ -153,121 +299,87 @@ class PrsReader:
         self.packed_size = meta_data.packed_size
         self.output = bytearray(self.width * self.height * self.depth)
         self.format = 'RGBA' if self.depth == 4 else 'RGB'
+        self._dummy_alpha = None
 
     def unpack(self):
-        with open(self.file_path, 'rb') as f:
-            f.seek(0x10)
-            remaining = self.packed_size
-            dst = 0
-            bit = 0
-            ctl = 0
-
-            while remaining > 0 and dst < len(self.output):
-                bit >>= 1
-                if bit == 0:
-                    ctl = f.read(1)[0]
-                    remaining -= 1
-                    bit = 0x80
-
-                if remaining <= 0:
-                    break
-
-                if ctl & bit == 0:
-                    self.output[dst] = f.read(1)[0]
-                    dst += 1
-                    remaining -= 1
-                    continue
-
-                b = f.read(1)[0]
-                remaining -= 1
-                length = 0
-                shift = 0
-
-                if b & 0x80:
-                    if remaining <= 0:
-                        break
-                    shift = f.read(1)[0]
-                    remaining -= 1
-                    shift |= (b & 0x3f) << 8
-
-                    if b & 0x40:
-                        if remaining <= 0:
-                            break
-                        offset = f.read(1)[0]
-                        remaining -= 1
-                        length = self.length_table[offset]
-                    else:
-                        length = (shift & 0xf) + 3
-                        shift >>= 4
-                else:
-                    length = b >> 2
-                    b &= 3
-                    if b == 3:
-                        length += 9
-                        read_data = f.read(length)
-                        self.output[dst:dst + length] = read_data
-                        dst += len(read_data)
-                        remaining -= len(read_data)
-                        continue
-                    shift = length
-                    length = b + 2
-
-                shift += 1
-                if dst < shift:
-                    raise ValueError("Invalid offset value")
-                length = min(length, len(self.output) - dst)
-                for i in range(length):
-                    self.output[dst + i] = self.output[dst - shift + i]
-                dst += length
+        global _prs_unpack_native
+        src = self.data[0x10:0x10 + self.packed_size]
+
+        if _prs_unpack_c is not None:
+            _prs_unpack_c(src, self.output)
+        elif _prs_unpack_native is not None:
+            try:
+                _prs_unpack_native(np.frombuffer(src, np.uint8),
+                                   np.frombuffer(self.output, np.uint8),
+                                   _LENGTH_TABLE_NATIVE)
+            except NumbaError:
+                # A failed JIT compile must never make an installed Numba
+                # strictly worse than no Numba; drop to the interpreter
+                _prs_unpack_native = None
+                _prs_unpack(src, memoryview(self.output), _LENGTH_TABLE)
+        else:
+            # A memoryview skips a layer of bytearray dispatch on every store
+            _prs_unpack(src, memoryview(self.output), _LENGTH_TABLE)
 
-            if self.flag & 0x80:
-                for i in range(self.depth, len(self.output)):
-                    self.output[i] = (self.output[i] + self.output[i - self.depth]) % 256
+        arr = np.frombuffer(self.output, np.uint8).reshape(-1, self.depth)
+        if self.flag & 0x80:
+            # Inverse delta filter is a per-component prefix sum; uint8
+            # accumulation wraps mod 256 for free
+            arr = np.cumsum(arr, axis=0, dtype=np.uint8)
+        self._pixels = arr.reshape(self.height, self.width, self.depth)
 
-            if self.depth == 4 and self.is_dummy_alpha_channel():
-                self.format = 'RGB'
+        if self.depth == 4 and self.is_dummy_alpha_channel():
+            self.format = 'RGB'
 
     def is_dummy_alpha_channel(self):
-        alpha = self.output[3]
-        if alpha == 0xFF:
-            return False
-        for i in range(7, len(self.output), 4):
-            if self.output[i] != alpha:
-                return False
-        return True
+        # Memoized; both unpack and save_as_bmp ask for it
+        if self._dummy_alpha is None:
+            alphas = self._pixels.reshape(-1, 4)[:, 3]
+            self._dummy_alpha = bool(alphas[0] != 0xFF and np.all(alphas == alphas[0]))
+        return self._dummy_alpha
 
     def save_as_bmp(self, output_path):
-        mode = 'RGBA' if self.depth == 4 else 'RGB'
-        image = Image.frombytes(mode, (self.width, self.height), bytes(self.output))
-        
-        # Swap channels from BGR to RGB
-        if self.depth == 3:
-            # Convert BGR to RGB for RGB images
-            r, g, b = image.split()
-            image = Image.merge("RGB", (b, g, r))
-        elif self.depth == 4:
-            # Convert BGRA to RGBA for images with alpha channel
-            r, g, b, a = image.split()
-            image = Image.merge("RGBA", (b, g, r, a))
-
-        # Convert image to RGB if alpha channel is dummy
-        if mode == 'RGBA' and self.is_dummy_alpha_channel():
-            image = image.convert('RGB')
-        
-        image.save(output_path, 'BMP')
-
-def read_prs_meta_data(file_path):
-    with open(file_path, 'rb') as f:
-        header = f.read(16)
-        if header[:2] != b'YB':
-            raise ValueError("Not a valid PRS file")
-        bpp = header[3]
-        if bpp not in (3, 4):
-            raise ValueError("Unsupported BPP value")
-        width, height = struct.unpack_from('<HH', header, 12)
-        flag = header[2]
-        packed_size = struct.unpack_from('<I', header, 4)[0]
-        return PrsMetaData(width, height, bpp * 8, flag, packed_size)
+        # PRS pixel data is already in BMP's native BGR(A) order, so the
+        # buffer goes to disk with no channel shuffle and no Pillow encoder
+
+        # Drop the alpha channel if it is dummy
+        if self.depth == 4 and self.is_dummy_alpha_channel():
+            pixels = np.ascontiguousarray(self._pixels[..., :3])
+            depth = 3
+        else:
+            pixels = self._pixels
+            depth = self.depth
+
+        row_stride = (self.width * depth + 3) & ~3
+        if row_stride != self.width * depth:
+            rows = np.zeros((self.height, row_stride), np.uint8)
+            rows[:, :self.width * depth] = pixels.reshape(self.height, -1)
+        else:
+            rows = pixels.reshape(self.height, -1)
+
+        data_size = row_stride * self.height
+        with open(output_path, 'wb') as f:
+            if depth == 4:
+                # BITMAPV4HEADER with explicit channel masks so alpha survives
+                f.write(struct.pack('<2sIHHI', b'BM', 14 + 108 + data_size, 0, 0, 14 + 108))
+                f.write(struct.pack('<IiiHHIIiiII', 108, self.width, -self.height, 1, 32,
+                                    3, data_size, 2835, 2835, 0, 0))
+                f.write(struct.pack('<IIII', 0x00FF0000, 0x0000FF00, 0x000000FF, 0xFF000000))
+                f.write(b'sRGB' + b'\x00' * 48)
+            else:
+                f.write(struct.pack('<2sIHHI', b'BM', 14 + 40 + data_size, 0, 0, 14 + 40))
+                # Negative height = top-down rows, matching the buffer layout
+                f.write(struct.pack('<IiiHHIIiiII', 40, self.width, -self.height, 1, 24,
+                                    0, data_size, 2835, 2835, 0, 0))
+            f.write(rows.tobytes())
+
+def read_prs_meta_data(data):
+    magic, flag, bpp, packed_size, width, height = _PRS_HEADER.unpack_from(data)
+    if magic != b'YB':
+        raise ValueError("Not a valid PRS file")
+    if bpp not in (3, 4):
+        raise ValueError("Unsupported BPP value")
+    return PrsMetaData(width, height, bpp * 8, flag, packed_size)
 
 def convert_bmp_to_prs(input_path, output_path):
     with Image.open(input_path) as image:
@@ -277,23 +389,39 @@ def convert_bmp_to_prs(input_path, output_path):
         writer.save_to_file(output_path)
 
 def convert_prs_to_bmp(input_path, output_path):
-    meta_data = read_prs_meta_data(input_path)
-    reader = PrsReader(input_path, meta_data)
+    # One read serves both the header parse and the decoder
+    with open(input_path, 'rb') as f:
+        data = f.read()
+    meta_data = read_prs_meta_data(data)
+    reader = PrsReader(data, meta_data)
     reader.unpack()
     reader.save_as_bmp(output_path)
 
 def process_directory(input_dir, output_dir, conversion_type):
     os.makedirs(output_dir, exist_ok=True)
-    for filename in os.listdir(input_dir):
-        input_file = os.path.join(input_dir, filename)
-        if conversion_type == 'bmp2prs' and filename.lower().endswith('.bmp'):
-            output_file = os.path.join(output_dir, os.path.splitext(filename)[0] + '.prs')
-            convert_bmp_to_prs(input_file, output_file)
-            print(f"Converted: {input_file} -> {output_file}")
-        elif conversion_type == 'prs2bmp' and filename.lower().endswith('.prs'):
-            output_file = os.path.join(output_dir, os.path.splitext(filename)[0] + '.bmp')
-            convert_prs_to_bmp(input_file, output_file)
-            print(f"Converted: {input_file} -> {output_file}")
+    if conversion_type == 'bmp2prs':
+        convert, in_ext, out_ext = convert_bmp_to_prs, '.bmp', '.prs'
+    else:
+        convert, in_ext, out_ext = convert_prs_to_bmp, '.prs', '.bmp'
+
+    # scandir avoids a stat per name on most platforms
+    jobs = []
+    with os.scandir(input_dir) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.lower().endswith(in_ext):
+                output_file = os.path.join(output_dir, os.path.splitext(entry.name)[0] + out_ext)
+                jobs.append((convert, entry.path, output_file))
+
+    # Conversions are CPU-bound and independent, so processes sidestep the GIL
+    with ProcessPoolExecutor() as executor:
+        futures = {executor.submit(func, src, dst): (src, dst) for func, src, dst in jobs}
+        for future in as_completed(futures):
+            src, dst = futures[future]
+            try:
+                future.result()
+                print(f"Converted: {src} -> {dst}")
+            except Exception as e:
+                print(f"Failed: {src} ({e})")
 
 def main():
     parser = argparse.ArgumentParser(description="Convert between BMP and PRS formats.")
@@ -1,11 +1,10 @@
 #Use this file to create patches that is mg_data2.mbl, mg_data3.mbl and so on. IT WILL NOT WORK IF YOU TRY TO CREATE THE ARCHIVE ITSELF AS THE ORIGINAL ARCHIVE HAS SOME HEX DATA THAT IS REQUIRED BUT UNKNOWN HOW IT
 #GOT THERE. So just use it to make patches, also you might need to change the name_length depending on the archive. In this case it was 13.
 
+import shutil
 import struct
 import sys
 import os
-import zlib
-from io import BytesIO
 
 class Entry:
     def __init__(self, name, entry_type, offset, size):
@@ -29,41 +28,24 @@ def write_fixed_length_string(file, string, length):
 
 def pack_files(file_paths, output_file):
     entries = []
-    data_buffer = BytesIO()
-    
+
     entry_size = 0x15  # Each entry is exactly 21 bytes (0x15)
     header_size = 8  # Starting size for count + filename length fields
     data_section_offset = header_size + (entry_size * len(file_paths))  # Data section starts after the header
 
     offset = 0  # Offset in the data section
 
-    # Create entries and write file data to data_buffer
+    # First pass: stat sizes only; files are written verbatim so no read is needed yet
     for file_path in file_paths:
         filename = os.path.basename(file_path)
         name_without_ext = os.path.splitext(filename)[0].lower()
-
-        # Read the file data
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
-
-        # Check if the first byte is 0x78, indicating the file is already compressed
-        if file_data[0] == 0x78:
-            compressed_data = file_data  # Already compressed, no need to compress again
-        else:
-            compressed_data = file_data
-           # compressed_data = zlib.compress(file_data)  # Compress the file data
-        
-        size = len(compressed_data)
-
-        # Write compressed data to buffer
-        entry_offset = offset
-        data_buffer.write(compressed_data)
-        offset += size  # Update offset for the next file
+        size = os.path.getsize(file_path)
 
         # Create a new entry for the archive, respecting the 13-byte name limit
-        entry = Entry(name_without_ext, "image", data_section_offset + entry_offset, size)
+        entry = Entry(name_without_ext, "image", data_section_offset + offset, size)
         entries.append(entry)
-    
+        offset += size  # Update offset for the next file
+
     # Open the output file for writing
     with open(output_file, 'wb') as archive_file:
         # Write the entry count (4 bytes) and filename length (4 bytes)
@@ -77,8 +59,10 @@ def pack_files(file_paths, output_file):
             # Write the 4-byte offset and 4-byte size
             archive_file.write(struct.pack('<I I', entry.offset, entry.size))
 
-        # Write the file data buffer (which contains the compressed file data)
-        archive_file.write(data_buffer.getvalue())
+        # Second pass: stream each file straight into the archive
+        for file_path in file_paths:
+            with open(file_path, 'rb') as src:
+                shutil.copyfileobj(src, archive_file, 1 << 20)
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
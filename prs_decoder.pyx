@@ -0,0 +1,86 @@
+# cython: boundscheck=False, wraparound=False, language_level=3
+# Cython build of the PRS LZ77 decoder. Unlike the Numba path this has no
+# per-process JIT warmup, so it is the better fit for one-shot CLI runs.
+# Build in place with: python setup.py build_ext --inplace
+# PRS_IMAGE_CONVERTER.py picks it up automatically when present.
+
+cdef unsigned short _length_table[256]
+cdef int _i
+for _i in range(0xfe):
+    _length_table[_i] = _i + 3
+_length_table[0xfe] = 0x400
+_length_table[0xff] = 0x1000
+
+
+def unpack_c(const unsigned char[:] src, unsigned char[:] out):
+    """LZ77 decode `src` into `out`; same bitstream as _prs_unpack."""
+    cdef Py_ssize_t src_len = src.shape[0]
+    cdef Py_ssize_t out_len = out.shape[0]
+    cdef Py_ssize_t sp = 0
+    cdef Py_ssize_t dst = 0
+    cdef Py_ssize_t i
+    cdef int ctl, bit, flag, b, length, shift, offset
+
+    while sp < src_len and dst < out_len:
+        ctl = src[sp]
+        sp += 1
+        bit = 0x80
+
+        while bit != 0 and sp < src_len and dst < out_len:
+            flag = ctl & bit
+            bit >>= 1
+
+            if flag == 0:
+                out[dst] = src[sp]
+                dst += 1
+                sp += 1
+                continue
+
+            b = src[sp]
+            sp += 1
+            length = 0
+            shift = 0
+
+            if b & 0x80:
+                if sp >= src_len:
+                    break
+                shift = src[sp]
+                sp += 1
+                shift |= (b & 0x3f) << 8
+
+                if b & 0x40:
+                    if sp >= src_len:
+                        break
+                    offset = src[sp]
+                    sp += 1
+                    length = _length_table[offset]
+                else:
+                    length = (shift & 0xf) + 3
+                    shift >>= 4
+            else:
+                length = b >> 2
+                b &= 3
+                if b == 3:
+                    length += 9
+                    if length > src_len - sp:
+                        length = src_len - sp
+                    if length > out_len - dst:
+                        length = out_len - dst
+                    for i in range(length):
+                        out[dst + i] = src[sp + i]
+                    dst += length
+                    sp += length
+                    continue
+                shift = length
+                length = b + 2
+
+            shift += 1
+            if dst < shift:
+                raise ValueError("Invalid offset value")
+            if length > out_len - dst:
+                length = out_len - dst
+            # Byte-by-byte is correct for overlapping copies and compiles
+            # to a tight C loop here
+            for i in range(length):
+                out[dst + i] = out[dst - shift + i]
+            dst += length
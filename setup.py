@@ -0,0 +1,9 @@
+# Builds the optional Cython PRS decoder used by PRS_IMAGE_CONVERTER.py:
+#   python setup.py build_ext --inplace
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name='prs_decoder',
+    ext_modules=cythonize('prs_decoder.pyx'),
+)